@@ -4,8 +4,17 @@ SpoonOS 法律公正助手 + 区块链证据存证 后端
 import os
 import json
 import asyncio
+import concurrent.futures
+import threading
+
+try:
+    import pybase64 as base64  # SIMD 加速的 base64，接口与标准库一致
+except ImportError:
+    import base64
+
 from flask import Flask, request, jsonify
 from flask_cors import CORS
+from cachetools import LRUCache
 from dotenv import load_dotenv
 
 # ================== 1. 环境变量 & Flask ==================
@@ -14,6 +23,21 @@ load_dotenv()
 app = Flask(__name__)
 CORS(app)
 
+# 进程级后台事件循环：上传请求复用同一个 loop，避免每次请求新建/关闭 loop
+_BG_LOOP = asyncio.new_event_loop()
+threading.Thread(target=_BG_LOOP.run_forever, name="upload-loop", daemon=True).start()
+
+
+def run_async(coro, timeout=120):
+    """在后台事件循环上执行协程并阻塞等待结果；超时会取消协程，异常原样抛出"""
+    fut = asyncio.run_coroutine_threadsafe(coro, _BG_LOOP)
+    try:
+        return fut.result(timeout=timeout)
+    except concurrent.futures.TimeoutError:
+        fut.cancel()
+        raise
+
+
 # ================== 2. 区块链证据上传工具（spoon_ai） ==================
 upload_tool = None
 
@@ -29,6 +53,10 @@ def init_upload_agent():
         return False
 
 
+# 在模块导入时初始化，确保 gunicorn 多 worker 进程各自持有上传工具
+init_upload_agent()
+
+
 @app.route('/api/upload-evidence', methods=['POST'])
 def upload_evidence():
     """上传证据并上链"""
@@ -49,6 +77,10 @@ def upload_evidence():
         # 前端历史值兼容：text -> document
         if evidence_type == 'text':
             evidence_type = 'document'
+        # 在读取文件之前校验类型，非法请求不必读取/编码整个上传文件
+        from examples.user_evidence_upload_agent import VALID_EVIDENCE_TYPES
+        if evidence_type not in VALID_EVIDENCE_TYPES:
+            return jsonify({'error': f'不支持的证据类型: {evidence_type}'}), 400
         evidence_source = request.form.get('evidence_source', 'user_upload')
         user_address = request.form.get('user_address', '')
         description = request.form.get('description', '')
@@ -60,33 +92,26 @@ def upload_evidence():
                 file_content = file_content.decode('utf-8')
             except UnicodeDecodeError:
                 # 如果不是文本文件，转换为 base64
-                import base64
-                file_content = base64.b64encode(file_content).decode('utf-8')
+                file_content = base64.b64encode(file_content).decode('ascii')
                 evidence_type = 'binary'
 
-        # 运行工具（异步）
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-
-        try:
-            # sign_with 参数目前仅用于接口兼容；真实上链使用 .env 的 PRIVATE_KEY
-            sign_with = user_address or "local"
-            result = loop.run_until_complete(
-                upload_tool.execute(
-                    evidence_content=file_content,
-                    evidence_type=evidence_type,
-                    source=evidence_source,
-                    sign_with=sign_with,
-                    description=description,
-                    uploader_address=user_address,
-                    file_name=file.filename,
-                    metadata={
-                        "content_encoding": "utf-8" if evidence_type != "binary" else "base64",
-                    },
-                )
+        # 运行工具（异步，提交到后台事件循环）
+        # sign_with 参数目前仅用于接口兼容；真实上链使用 .env 的 PRIVATE_KEY
+        sign_with = user_address or "local"
+        result = run_async(
+            upload_tool.execute(
+                evidence_content=file_content,
+                evidence_type=evidence_type,
+                source=evidence_source,
+                sign_with=sign_with,
+                description=description,
+                uploader_address=user_address,
+                file_name=file.filename,
+                metadata={
+                    "content_encoding": "utf-8" if evidence_type != "binary" else "base64",
+                },
             )
-        finally:
-            loop.close()
+        )
 
         # 解析结果
         if isinstance(result, str):
@@ -139,35 +164,14 @@ def upload_evidence():
 def health():
     return jsonify({
         "status": "ok",
-        "upload_tool_ready": upload_tool is not None
+        "upload_tool_ready": upload_tool is not None,
+        "chat_agent_ready": agent is not None,
     })
 
 
 # ================== 3. LLM / Agent（法律助手） ==================
-from llama_index.llms.openai_like import OpenAILike
-from llama_index.core import Settings
-from llama_index.embeddings.huggingface import HuggingFaceEmbedding
-from llama_index.core.agent.workflow import ReActAgent
-from llama_index.core.memory import ChatMemoryBuffer
-from llama_index.core.workflow import Context
-
-from skills.legal_skill import search_laws
-from skills.notary_skill import notarize_on_chain
-
-api_key = os.getenv("OPENAI_API_KEY")
-api_base = os.getenv("OPENAI_BASE_URL", "https://api.deepseek.com")
-model_name = os.getenv("MODEL_NAME", "deepseek-chat")
-
-llm = OpenAILike(
-    api_key=api_key,
-    api_base=api_base,
-    model=model_name,
-    is_chat_model=True,
-)
-
-Settings.llm = llm
-Settings.embed_model = HuggingFaceEmbedding(model_name="BAAI/bge-small-zh-v1.5")
-
+# llama_index / 嵌入模型 / 向量索引体积较大，首次 /api/chat 时才加载，
+# 保证 /api/health 与 /api/upload-evidence 的冷启动不受影响。
 SYSTEM_PROMPT = """
 你是 SpoonOS 法律公正助手。
 
@@ -177,15 +181,78 @@ SYSTEM_PROMPT = """
 3. 若用户要求存证，调用 notarize_on_chain
 """
 
-agent = ReActAgent(
-    tools=[search_laws, notarize_on_chain],
-    llm=llm,
-    system_prompt=SYSTEM_PROMPT,
-    verbose=True,
-)
-
-ctx = Context(agent)
-memory = ChatMemoryBuffer.from_defaults(llm=llm)
+llm = None
+agent = None
+prompt_cache = None
+_agent_lock = threading.Lock()
+
+# 按会话隔离的 (Context, 对话记忆, 会话锁)：LRU 淘汰最久未活跃的会话，token_limit 限制单个会话的上下文长度。
+# 应用运行在线程池 WSGI 服务器上（见启动入口）：每个请求独占一个工作线程，Flask 在该线程中为 async 视图
+# 新建事件循环，因此会话锁使用 threading.Lock，等待锁只阻塞同会话的请求线程，不影响其他请求。
+_MEMORY_TOKEN_LIMIT = int(os.getenv("CHAT_MEMORY_TOKEN_LIMIT", "3000"))
+_sessions = LRUCache(maxsize=int(os.getenv("CHAT_MAX_SESSIONS", "10000")))
+_sessions_lock = threading.Lock()
+
+
+def init_chat_agent():
+    """加载 LLM、嵌入模型与技能并构建 ReActAgent（只执行一次）"""
+    global llm, agent, prompt_cache
+    with _agent_lock:
+        if agent is not None:
+            return agent
+
+        from llama_index.llms.openai_like import OpenAILike
+        from llama_index.core import Settings
+        from llama_index.core.agent.workflow import ReActAgent
+
+        from embedding import get_embed_model
+        from prompt_cache import PromptCache
+        from skills.legal_skill import search_laws
+        from skills.notary_skill import notarize_on_chain
+
+        api_key = os.getenv("OPENAI_API_KEY")
+        api_base = os.getenv("OPENAI_BASE_URL", "https://api.deepseek.com")
+        model_name = os.getenv("MODEL_NAME", "deepseek-chat")
+
+        llm = OpenAILike(
+            api_key=api_key,
+            api_base=api_base,
+            model=model_name,
+            is_chat_model=True,
+        )
+
+        Settings.llm = llm
+        Settings.embed_model = get_embed_model()
+
+        new_agent = ReActAgent(
+            tools=[search_laws, notarize_on_chain],
+            llm=llm,
+            system_prompt=SYSTEM_PROMPT,
+            verbose=True,
+        )
+
+        # 提示缓存（精确 + 语义），PROMPT_CACHE=0 可关闭
+        if os.getenv("PROMPT_CACHE", "1") != "0":
+            prompt_cache = PromptCache(Settings.embed_model)
+
+        agent = new_agent
+        return agent
+
+
+def get_session(session_id: str):
+    """按会话 ID 获取（必要时创建）该会话的 (Context, 对话记忆, 会话锁)"""
+    with _sessions_lock:
+        session = _sessions.get(session_id)
+        if session is None:
+            from llama_index.core.memory import ChatMemoryBuffer
+            from llama_index.core.workflow import Context
+            session = (
+                Context(agent),
+                ChatMemoryBuffer.from_defaults(llm=llm, token_limit=_MEMORY_TOKEN_LIMIT),
+                threading.Lock(),
+            )
+            _sessions[session_id] = session
+        return session
 
 
 @app.route('/api/chat', methods=['POST'])
@@ -193,17 +260,39 @@ async def chat():
     user_input = request.json.get("message")
     if not user_input:
         return jsonify({"error": "message 不能为空"}), 400
+    # 会话 ID：优先取请求头，其次取请求体；都没有时归入默认会话
+    session_id = request.headers.get("X-Session-Id") or request.json.get("session_id") or "default"
 
     try:
-        handler = agent.run(user_input, memory=memory, ctx=ctx)
-        response = await handler
-        return jsonify({"response": str(response)})
+        init_chat_agent()
+        ctx, memory, session_lock = get_session(session_id)
+        from prompt_cache import chat_with_cache
+
+        # 每个请求在自己的线程与事件循环中执行，缓存查找直接同步调用即可
+        answer, cached = await chat_with_cache(
+            prompt_cache, memory, session_lock, user_input,
+            lambda: agent.run(user_input, memory=memory, ctx=ctx),
+            offload=False,
+        )
+        if cached:
+            return jsonify({"response": answer, "cached": True})
+        return jsonify({"response": answer})
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 
 # ================== 4. 启动入口 ==================
+# 以线程池 WSGI 服务器运行：每个请求占用一个工作线程，上链等待回执、LLM 调用等网络等待可相互重叠。
+# 多进程部署：gunicorn -k gthread -w 4 --threads 32 -b 0.0.0.0:5000 app:app
 if __name__ == "__main__":
-    init_upload_agent()
     print("🚀 SpoonOS 法律公正助手后端启动中...")
-    app.run(host="0.0.0.0", port=5000, debug=True)
+    try:
+        from waitress import serve
+    except ImportError:  # waitress 为可选依赖（pip install ".[server]"），缺失时回退到开发服务器
+        serve = None
+        print("⚠️ 未安装 waitress，改用 Flask 开发服务器")
+    if os.getenv("FLASK_DEV") or serve is None:
+        # 本地调试：Werkzeug 开发服务器（单进程，多线程）
+        app.run(host="0.0.0.0", port=5000, threaded=True)
+    else:
+        serve(app, host="0.0.0.0", port=5000, threads=int(os.getenv("WSGI_THREADS", "32")))
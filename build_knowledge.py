@@ -11,13 +11,14 @@ from llama_index.core import (
     Settings,
 )
 from llama_index.core.node_parser import SentenceSplitter
-from llama_index.embeddings.huggingface import HuggingFaceEmbedding
+
+from embedding import get_embed_model
 
 # 1. 加载 .env（可选，供其他配置使用）
 load_dotenv()
 
-# 2. 使用 HuggingFace 中文嵌入模型
-embed_model = HuggingFaceEmbedding(model_name="BAAI/bge-small-zh-v1.5")
+# 2. 使用 HuggingFace 中文嵌入模型（与检索端共用同一后端）
+embed_model = get_embed_model()
 Settings.embed_model = embed_model
 
 # 3. 配置文本切片（chunk）
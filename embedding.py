@@ -0,0 +1,92 @@
+"""
+嵌入模型工厂：统一创建 bge-small-zh-v1.5 嵌入模型，供知识库构建、法律检索与对话共用。
+
+默认使用 ONNX Runtime + int8 动态量化后端（首次使用时导出并量化到本地目录）；
+设置 EMBED_BACKEND=torch 或缺少 onnx 依赖时回退到原始 FP32 PyTorch 模型。
+"""
+import os
+import tempfile
+from functools import lru_cache
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from llama_index.embeddings.huggingface import HuggingFaceEmbedding
+
+EMBED_MODEL_NAME = "BAAI/bge-small-zh-v1.5"
+
+# bge 中文模型的查询指令；从本地目录加载时无法按模型名自动推断，需要显式传入
+_QUERY_INSTRUCTION = "为这个句子生成表示以用于检索相关文章："
+
+# 量化后的 ONNX 模型保存目录与文件名（默认 avx512_vnni 配置：int8 权重 + VNNI 指令）
+# 不支持 VNNI 的 CPU 可通过 EMBED_ONNX_QUANT 选择 avx2 / avx512 / arm64，各配置的模型文件可共存
+_ONNX_DIR = Path(os.getenv(
+    "EMBED_ONNX_DIR",
+    str(Path(__file__).resolve().parent / "models" / "bge-small-zh-v1.5-onnx"),
+))
+# 各量化配置的权重类型（与 optimum 的 AutoQuantizationConfig 一致：avx2 为 uint8，其余为 int8）
+_ONNX_QUANT_CONFIGS = {"arm64": "qint8", "avx2": "quint8", "avx512": "qint8", "avx512_vnni": "qint8"}
+_ONNX_QUANT_CONFIG = os.getenv("EMBED_ONNX_QUANT", "avx512_vnni").lower()
+if _ONNX_QUANT_CONFIG not in _ONNX_QUANT_CONFIGS:
+    _ONNX_QUANT_CONFIG = "avx512_vnni"
+# 导出时显式指定文件后缀，保证导出产物与加载时的文件名一致
+_ONNX_FILE_SUFFIX = f"{_ONNX_QUANT_CONFIGS[_ONNX_QUANT_CONFIG]}_{_ONNX_QUANT_CONFIG}"
+_ONNX_FILE_NAME = f"onnx/model_{_ONNX_FILE_SUFFIX}.onnx"
+
+# 批量编码大小：构建索引时每次前向处理的文本条数（批内按最长文本动态 padding）
+_EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "32"))
+
+
+def _ensure_quantized_onnx(model_dir: Path) -> None:
+    """
+    若本地尚无量化模型，则导出 ONNX 并做一次 int8 动态量化。
+
+    多个 worker 进程可能同时首次启动：导出在文件锁内进行，先写入同目录下的临时目录，
+    再用 os.replace 原子地移动到最终位置，其他进程不会读到写了一半的模型文件。
+    """
+    target = model_dir / _ONNX_FILE_NAME
+    if target.exists():
+        return
+
+    from filelock import FileLock  # huggingface_hub 的依赖，随 sentence-transformers 一起安装
+
+    model_dir.parent.mkdir(parents=True, exist_ok=True)
+    with FileLock(str(model_dir) + ".lock"):
+        if target.exists():  # 等锁期间已由其他进程导出完成
+            return
+
+        from sentence_transformers import SentenceTransformer, export_dynamic_quantized_onnx_model
+
+        print(f"正在导出并量化嵌入模型到 {model_dir} ...")
+        with tempfile.TemporaryDirectory(dir=str(model_dir.parent)) as tmp:
+            tmp_dir = Path(tmp)
+            model = SentenceTransformer(EMBED_MODEL_NAME, backend="onnx")
+            if not model_dir.exists():
+                model.save_pretrained(str(tmp_dir / "base"))
+                os.replace(tmp_dir / "base", model_dir)
+            export_dynamic_quantized_onnx_model(
+                model, _ONNX_QUANT_CONFIG, str(tmp_dir / "quant"), file_suffix=_ONNX_FILE_SUFFIX
+            )
+            target.parent.mkdir(parents=True, exist_ok=True)
+            os.replace(tmp_dir / "quant" / _ONNX_FILE_NAME, target)
+
+
+@lru_cache(maxsize=1)
+def get_embed_model() -> "HuggingFaceEmbedding":
+    """返回进程内共享的嵌入模型实例（torch / transformers 在首次调用时才导入）"""
+    from llama_index.embeddings.huggingface import HuggingFaceEmbedding
+
+    if os.getenv("EMBED_BACKEND", "onnx").lower() == "onnx":
+        try:
+            _ensure_quantized_onnx(_ONNX_DIR)
+            return HuggingFaceEmbedding(
+                model_name=str(_ONNX_DIR),
+                query_instruction=_QUERY_INSTRUCTION,
+                embed_batch_size=_EMBED_BATCH_SIZE,
+                backend="onnx",
+                model_kwargs={"file_name": _ONNX_FILE_NAME},
+            )
+        except Exception as e:
+            print(f"⚠️ ONNX 量化嵌入模型不可用，回退到 PyTorch 模型: {e}")
+
+    return HuggingFaceEmbedding(model_name=EMBED_MODEL_NAME, embed_batch_size=_EMBED_BATCH_SIZE)
@@ -14,10 +14,11 @@ import time
 import hmac
 import hashlib
 import base64
+import functools
+import re
 from datetime import datetime
-from typing import List, Dict, Any, Optional
+from typing import TYPE_CHECKING, Awaitable, Callable, List, Dict, Any, Optional, Tuple
 import logging
-import aiohttp
 from urllib.parse import quote
 
 from spoon_ai.agents.toolcall import ToolCallAgent
@@ -26,9 +27,188 @@ from spoon_ai.tools import ToolManager
 from spoon_ai.tools.turnkey_tools import SignMessageTool, BroadcastTransactionTool
 from spoon_ai.chat import ChatBot
 from pydantic import Field
+import orjson
+
+if TYPE_CHECKING:
+    import aiohttp
+
+try:
+    import ahocorasick
+except ImportError:  # pyahocorasick 为可选加速依赖，缺失时回退到逐个关键词子串匹配
+    ahocorasick = None
+
+try:
+    import blake3
+except ImportError:  # blake3 为可选加速依赖，缺失时回退到 SHA-256
+    blake3 = None
 
 logger = logging.getLogger(__name__)
 
+# 证据哈希算法：默认优先 BLAKE3（可用 EVIDENCE_HASH_ALGO=sha256 强制回退）
+_HASH_ALGO = os.getenv("EVIDENCE_HASH_ALGO", "blake3" if blake3 is not None else "sha256").lower()
+if _HASH_ALGO == "blake3" and blake3 is None:
+    _HASH_ALGO = "sha256"
+# 写入 payload 的算法标签，便于验证方选择对应哈希；SHA-256 保持原有格式不加标签
+_HASH_TAG = b"blake3-256:" if _HASH_ALGO == "blake3" else b""
+EVIDENCE_HASH_NAME = "blake3-256" if _HASH_ALGO == "blake3" else "sha256"
+
+# 证据上链 payload 前缀（单条 / 批量）
+# 链上只写紧凑二进制：前缀 + 可选算法标签 + 每条证据 32 字节摘要；
+# 证据原文不上链，完整 evidence_data 仅随接口响应返回
+_EVIDENCE_PREFIX = b"SPOON_EVIDENCE_V1|"
+_EVIDENCE_BATCH_PREFIX = b"SPOON_EVIDENCE_BATCH_V1|"
+
+def new_evidence_hasher():
+    """创建证据哈希对象（BLAKE3 大输入时自动多线程，否则 SHA-256）"""
+    if _HASH_ALGO == "blake3":
+        return blake3.blake3(max_threads=blake3.blake3.AUTO)
+    return hashlib.sha256()
+
+def evidence_digest(data: Dict[str, Any]) -> bytes:
+    """
+    计算证据数据规范化 JSON 的 32 字节原始摘要。
+
+    规范形式固定由 orjson 定义（不提供其他序列化回退，保证同一数据只有一种哈希）：
+    键按字典序排列、紧凑格式、UTF-8；浮点数为最短往返表示；
+    只接受字符串键与 64 位以内的整数，其余输入抛出 TypeError。
+    """
+    digest = new_evidence_hasher()
+    digest.update(orjson.dumps(data, option=orjson.OPT_SORT_KEYS))
+    return digest.digest()
+
+# 粗粒度时钟：同一毫秒内的调用复用已格式化的 ISO 时间戳
+_TS_CACHE = ("", 0.0)
+
+def now_iso() -> str:
+    """当前本地时间的 ISO 字符串（1ms 内复用缓存，突发请求下省去重复格式化）"""
+    global _TS_CACHE
+    now = time.time()
+    text, at = _TS_CACHE
+    if 0 <= now - at < 0.001:
+        return text
+    text = datetime.fromtimestamp(now).isoformat()
+    _TS_CACHE = (text, now)
+    return text
+
+def encode_json(obj: Dict[str, Any]) -> str:
+    """工具响应的统一序列化出口：紧凑 UTF-8 JSON"""
+    return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS).decode("utf-8")
+
+# 进程级共享 HTTP 会话：复用连接池 / DNS 缓存 / TLS 连接，避免每次调用重新握手
+_SESSION: Optional["aiohttp.ClientSession"] = None
+
+async def _get_session() -> "aiohttp.ClientSession":
+    """获取（必要时创建）共享的 aiohttp 会话（aiohttp 延迟导入）"""
+    global _SESSION
+    if _SESSION is None or _SESSION.closed:
+        import aiohttp
+
+        _SESSION = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=100, ttl_dns_cache=300, keepalive_timeout=60)
+        )
+    return _SESSION
+
+async def close_http_session() -> None:
+    """关闭共享的 aiohttp 会话（进程退出前调用）"""
+    global _SESSION
+    if _SESSION is not None and not _SESSION.closed:
+        await _SESSION.close()
+    _SESSION = None
+
+# 按 RPC 地址缓存的 AsyncWeb3 实例，进程内复用 HTTP 连接
+_ASYNC_WEB3: Dict[str, Any] = {}
+
+def _get_async_web3(rpc_url: str) -> Any:
+    """获取（必要时创建）指定 RPC 的 AsyncWeb3 实例"""
+    w3 = _ASYNC_WEB3.get(rpc_url)
+    if w3 is None:
+        from web3 import AsyncWeb3, AsyncHTTPProvider
+        from web3.middleware import ExtraDataToPOAMiddleware
+
+        w3 = AsyncWeb3(AsyncHTTPProvider(rpc_url))
+        try:
+            w3.middleware_onion.inject(ExtraDataToPOAMiddleware, layer=0)
+        except Exception:
+            # 不是 PoA 链也没关系
+            pass
+        _ASYNC_WEB3[rpc_url] = w3
+    return w3
+
+# 按 RPC 地址缓存的 chain_id（同一 RPC 的链 ID 不会变化）
+_CHAIN_IDS: Dict[str, int] = {}
+
+
+async def _wait_receipt(w3: Any, tx_hash_bytes: bytes) -> Optional[int]:
+    """等待交易回执（短超时；超时也不影响“已广播”事实），返回回执 status，未等到时为 None"""
+    try:
+        receipt = await w3.eth.wait_for_transaction_receipt(tx_hash_bytes, timeout=30)
+        return int(getattr(receipt, "status", receipt.get("status", 0)))  # type: ignore[attr-defined]
+    except Exception:
+        return None
+
+async def _get_chain_id(w3: Any, rpc_url: str) -> int:
+    """获取链 ID，首次查询后缓存"""
+    chain_id = _CHAIN_IDS.get(rpc_url)
+    if chain_id is None:
+        chain_id = _CHAIN_IDS[rpc_url] = int(await w3.eth.chain_id)
+    return chain_id
+
+@functools.lru_cache(maxsize=32)
+def _keyword_matcher(keywords: tuple) -> Callable[[str], List[str]]:
+    """
+    按关键词集合构建并缓存匹配函数（大小写不敏感，结果保持 keywords 原有顺序）。
+
+    关键词只 casefold 一次；安装了 pyahocorasick 时构建 Aho–Corasick 自动机，
+    每条消息单次扫描即可找出全部关键词。一次扫描的所有消息共用同一个匹配函数。
+    """
+    folded_keywords = tuple(kw.casefold() for kw in keywords)
+
+    if ahocorasick is None:
+        pairs = tuple(zip(keywords, folded_keywords))
+
+        def match(content: str) -> List[str]:
+            content_folded = content.casefold()
+            return [kw for kw, folded in pairs if folded in content_folded]
+
+        return match
+
+    # 自动机的值为该 casefold 模式对应的原始关键词
+    automaton = ahocorasick.Automaton()
+    for kw, folded in zip(keywords, folded_keywords):
+        if folded:
+            if folded in automaton:
+                automaton.get(folded).append(kw)
+            else:
+                automaton.add_word(folded, [kw])
+    automaton.make_automaton()
+
+    def match(content: str) -> List[str]:
+        found = {kw for _, originals in automaton.iter(content.casefold()) for kw in originals}
+        return [kw for kw in keywords if kw in found or not kw]
+
+    return match
+
+# 预编码 JSON 模板中的占位符："__NAME__"（含引号）会被替换为对应值的 JSON 编码
+_PLACEHOLDER_RE = re.compile(r'"__([A-Z_]+)__"')
+
+def _render_json_template(template: str, **values: Any) -> str:
+    """单次扫描替换模板占位符，避免每次调用重新序列化静态内容"""
+    encoded = {name.upper(): json.dumps(value, ensure_ascii=False) for name, value in values.items()}
+    return _PLACEHOLDER_RE.sub(lambda m: encoded[m.group(1)], template)
+
+_WECHAT_WORK_CONFIG_TEMPLATE = json.dumps({
+    "status": "config_required",
+    "message": "企业微信消息监听需要配置回调URL",
+    "setup_steps": [
+        "1. 在企业微信管理后台配置应用回调URL",
+        "2. 实现消息接收端点处理微信推送",
+        "3. 设置消息加密解密",
+        "__KEYWORDS_STEP__"
+    ],
+    "corp_id": "__CORP_ID__",
+    "agent_id": "__AGENT_ID__"
+}, ensure_ascii=False)
+
 class WeChatWorkMonitorTool(BaseTool):
     """企业微信消息监听工具 - 使用企业微信官方API"""
 
@@ -68,13 +248,13 @@ class WeChatWorkMonitorTool(BaseTool):
         try:
             # 获取access_token
             token_url = f"https://qyapi.weixin.qq.com/cgi-bin/gettoken?corpid={corp_id}&corpsecret={corp_secret}"
-            async with aiohttp.ClientSession() as session:
-                async with session.get(token_url) as resp:
-                    token_data = await resp.json()
-                    if token_data.get("errcode") != 0:
-                        return f"获取企业微信token失败: {token_data.get('errmsg')}"
+            session = await _get_session()
+            async with session.get(token_url) as resp:
+                token_data = await resp.json()
+                if token_data.get("errcode") != 0:
+                    return f"获取企业微信token失败: {token_data.get('errmsg')}"
 
-                    access_token = token_data["access_token"]
+                access_token = token_data["access_token"]
 
             # 注意：企业微信消息监听需要配置回调URL，这里只是获取消息的示例
             # 实际实现需要服务器接收微信推送的消息
@@ -83,22 +263,29 @@ class WeChatWorkMonitorTool(BaseTool):
             messages_url = f"https://qyapi.weixin.qq.com/cgi-bin/externalcontact/get_chatdata?access_token={access_token}"
 
             # 这里返回配置说明，因为实际的消息监听需要服务器端点
-            return json.dumps({
-                "status": "config_required",
-                "message": "企业微信消息监听需要配置回调URL",
-                "setup_steps": [
-                    "1. 在企业微信管理后台配置应用回调URL",
-                    "2. 实现消息接收端点处理微信推送",
-                    "3. 设置消息加密解密",
-                    f"4. 监听关键词: {keywords}"
-                ],
-                "corp_id": corp_id,
-                "agent_id": agent_id
-            }, ensure_ascii=False)
+            return _render_json_template(
+                _WECHAT_WORK_CONFIG_TEMPLATE,
+                keywords_step=f"4. 监听关键词: {keywords}",
+                corp_id=corp_id,
+                agent_id=agent_id,
+            )
 
         except Exception as e:
             return f"企业微信监听失败: {str(e)}"
 
+@functools.lru_cache(maxsize=16)
+def _dingtalk_hmac_base(secret: str) -> "hmac.HMAC":
+    """按 secret 缓存已完成 key 填充的 HMAC-SHA256 对象，签名时 copy() 复用"""
+    return hmac.new(secret.encode('utf-8'), digestmod=hashlib.sha256)
+
+_DINGTALK_TESTED_TEMPLATE = json.dumps({
+    "status": "webhook_tested",
+    "message": "钉钉机器人连接成功",
+    "keywords": "__KEYWORDS__",
+    "duration": "__DURATION__",
+    "note": "钉钉机器人主要用于发送消息，要接收群消息需要配置自定义机器人并设置相应权限"
+}, ensure_ascii=False)
+
 class DingTalkMonitorTool(BaseTool):
     """钉钉消息监听工具 - 使用钉钉机器人API"""
 
@@ -132,7 +319,9 @@ class DingTalkMonitorTool(BaseTool):
     def _sign_request(self, secret: str, timestamp: str) -> str:
         """生成钉钉签名"""
         string_to_sign = f"{timestamp}\n{secret}"
-        hmac_code = hmac.new(secret.encode('utf-8'), string_to_sign.encode('utf-8'), digestmod=hashlib.sha256).digest()
+        mac = _dingtalk_hmac_base(secret).copy()
+        mac.update(string_to_sign.encode('utf-8'))
+        hmac_code = mac.digest()
         return base64.b64encode(hmac_code).decode('utf-8')
 
     async def execute(self, webhook_url: str, secret: Optional[str], keywords: List[str], duration: int = 300) -> str:
@@ -156,26 +345,50 @@ class DingTalkMonitorTool(BaseTool):
                 }
             }
 
-            async with aiohttp.ClientSession() as session:
-                async with session.post(test_url, json=test_message) as resp:
-                    if resp.status == 200:
-                        result = await resp.json()
-                        if result.get("errcode") == 0:
-                            return json.dumps({
-                                "status": "webhook_tested",
-                                "message": "钉钉机器人连接成功",
-                                "keywords": keywords,
-                                "duration": duration,
-                                "note": "钉钉机器人主要用于发送消息，要接收群消息需要配置自定义机器人并设置相应权限"
-                            }, ensure_ascii=False)
-                        else:
-                            return f"钉钉机器人测试失败: {result.get('errmsg')}"
+            session = await _get_session()
+            async with session.post(test_url, json=test_message) as resp:
+                if resp.status == 200:
+                    result = await resp.json()
+                    if result.get("errcode") == 0:
+                        return _render_json_template(
+                            _DINGTALK_TESTED_TEMPLATE, keywords=keywords, duration=duration
+                        )
                     else:
-                        return f"钉钉Webhook请求失败: HTTP {resp.status}"
+                        return f"钉钉机器人测试失败: {result.get('errmsg')}"
+                else:
+                    return f"钉钉Webhook请求失败: HTTP {resp.status}"
 
         except Exception as e:
             return f"钉钉监听失败: {str(e)}"
 
+_WECHAT_WEB_GUIDE_TEMPLATE = json.dumps({
+    "status": "manual_setup_required",
+    "message": "微信网页版监听需要手动扫码登录",
+    "implementation_guide": [
+        "1. 使用itchat库实现微信网页版自动化",
+        "2. 安装: pip install itchat",
+        "3. 实现消息监听函数",
+        "4. 处理登录和消息转发",
+        "5. 注意微信风控和账号安全"
+    ],
+    "sample_code": """
+import itchat
+
+@itchat.msg_register(itchat.content.TEXT)
+def text_reply(msg):
+    # 处理文本消息
+    if any(kw in msg['Text'] for kw in keywords):
+        # 检测到敏感关键词，触发取证流程
+        handle_sensitive_message(msg)
+
+itchat.auto_login(hotReload=True)
+itchat.run()
+                """,
+    "keywords": "__KEYWORDS__",
+    "duration": "__DURATION__",
+    "security_note": "微信网页版监听可能违反微信使用协议，请确保合规使用"
+}, ensure_ascii=False)
+
 class WeChatWebMonitorTool(BaseTool):
     """微信网页版消息监听工具"""
 
@@ -209,40 +422,14 @@ class WeChatWebMonitorTool(BaseTool):
             # 微信网页版API比较复杂，需要处理登录、保持会话等
             # 这里提供实现指导
 
-            return json.dumps({
-                "status": "manual_setup_required",
-                "message": "微信网页版监听需要手动扫码登录",
-                "implementation_guide": [
-                    "1. 使用itchat库实现微信网页版自动化",
-                    "2. 安装: pip install itchat",
-                    "3. 实现消息监听函数",
-                    "4. 处理登录和消息转发",
-                    "5. 注意微信风控和账号安全"
-                ],
-                "sample_code": """
-import itchat
-
-@itchat.msg_register(itchat.content.TEXT)
-def text_reply(msg):
-    # 处理文本消息
-    if any(kw in msg['Text'] for kw in keywords):
-        # 检测到敏感关键词，触发取证流程
-        handle_sensitive_message(msg)
-
-itchat.auto_login(hotReload=True)
-itchat.run()
-                """,
-                "keywords": keywords,
-                "duration": duration,
-                "security_note": "微信网页版监听可能违反微信使用协议，请确保合规使用"
-            }, ensure_ascii=False)
+            return _render_json_template(_WECHAT_WEB_GUIDE_TEMPLATE, keywords=keywords, duration=duration)
 
         except Exception as e:
             return f"微信网页版监听失败: {str(e)}"
 
     async def execute(self, platforms: List[str], keywords: List[str], duration: int = 30) -> str:
         """模拟监听消息"""
-        logger.info(f"开始监听平台: {platforms}, 关键词: {keywords}, 时长: {duration}秒")
+        logger.info("开始监听平台: %s, 关键词: %s, 时长: %s秒", platforms, keywords, duration)
 
         # 模拟消息数据（实际实现中需要接入微信/钉钉API）
         mock_messages = [
@@ -250,51 +437,51 @@ itchat.run()
                 "platform": "wechat",
                 "sender": "老板",
                 "content": "小王，今天需要加班到晚上8点",
-                "timestamp": datetime.now().isoformat(),
+                "timestamp": now_iso(),
                 "group": "工作群"
             },
             {
                 "platform": "dingtalk",
                 "sender": "HR",
                 "content": "本月工资已发放，请查收",
-                "timestamp": datetime.now().isoformat(),
+                "timestamp": now_iso(),
                 "group": "公司通知"
             },
             {
                 "platform": "wechat",
                 "sender": "同事",
                 "content": "今天天气真好",
-                "timestamp": datetime.now().isoformat(),
+                "timestamp": now_iso(),
                 "group": "闲聊群"
             }
         ]
 
         detected_messages = []
 
-        # 检测关键词
+        # 检测关键词（关键词集合只转换一次，供所有消息复用）
+        match_keywords = _keyword_matcher(tuple(keywords))
         for msg in mock_messages:
-            content_lower = msg["content"].lower()
-            matched_keywords = [kw for kw in keywords if kw.lower() in content_lower]
+            matched_keywords = match_keywords(msg["content"])
 
             if matched_keywords:
                 msg["matched_keywords"] = matched_keywords
                 detected_messages.append(msg)
-                logger.info(f"检测到敏感消息: {msg}")
+                logger.info("检测到敏感消息: %s", msg)
 
         # 模拟监听延时
         await asyncio.sleep(min(duration, 5))  # 实际实现中会持续监听
 
         if detected_messages:
-            return json.dumps({
+            return encode_json({
                 "status": "success",
                 "detected_count": len(detected_messages),
                 "messages": detected_messages
-            }, ensure_ascii=False, indent=2)
+            })
         else:
-            return json.dumps({
+            return encode_json({
                 "status": "no_matches",
                 "message": f"监听期间未检测到关键词: {keywords}"
-            }, ensure_ascii=False)
+            })
 
 class EvidenceStorageTool(BaseTool):
     """证据上链存储工具"""
@@ -340,6 +527,45 @@ class EvidenceStorageTool(BaseTool):
 
         优点：不需要部署合约；只要 RPC 可用、钱包有 gas，即可稳定落链。
         """
+        results = await self.execute_batch([evidence_data], sign_with)
+        return results[0]
+
+    async def execute_batch(self, evidence_list: List[Dict[str, Any]], sign_with: str) -> List[str]:
+        """批量上链，返回与 evidence_list 一一对应的 JSON 字符串（见 store_batch）"""
+        return [encode_json(result) for result in await self.store_batch(evidence_list, sign_with)]
+
+    async def store_batch(self, evidence_list: List[Dict[str, Any]], sign_with: str) -> List[Dict[str, Any]]:
+        """批量上链并等待回执，返回与 evidence_list 一一对应的结果字典（见 send_batch）"""
+        results, receipt = await self.send_batch(evidence_list, sign_with)
+        if receipt is not None:
+            receipt_status = await receipt
+            for result in results:
+                result["receipt_status"] = receipt_status
+        return results
+
+    async def send_batch(
+        self,
+        evidence_list: List[Dict[str, Any]],
+        sign_with: str,
+        evidence_digests: Optional[List[bytes]] = None,
+    ) -> Tuple[List[Dict[str, Any]], Optional[Awaitable[Optional[int]]]]:
+        """
+        批量上链：多条证据的 hash 依次拼接写入同一笔自转账交易的 calldata，
+        分摊每笔交易固定的 21000 gas 与签名/确认开销。
+
+        单条证据时 payload 为 SPOON_EVIDENCE_V1| + hash，与 execute 保持一致；
+        多条时为 SPOON_EVIDENCE_BATCH_V1| + hash_0 + hash_1 + ...，
+        第 i 条证据的 hash 位于前缀之后第 i 个 32 字节。
+        使用 BLAKE3 时前缀后紧跟算法标签 blake3-256:。
+        批量交易逐条写入原始摘要、不做随机线性组合或证明聚合，验证方按 batch_index
+        取出对应 32 字节直接比对即可，因此不需要额外的随机标量 / 盐值。
+        交易广播后立即返回 (结果字典列表, 等待回执的协程)：调用方可以先发送下一笔交易，
+        再等待回执并把 status 写回各结果的 receipt_status；失败时协程为 None。
+        evidence_digests 为调用方预先逐条算好的摘要（见 evidence_digest），省略时在此计算。
+        """
+
+        def fail(payload: Dict[str, Any]) -> Tuple[List[Dict[str, Any]], None]:
+            return [payload] * len(evidence_list), None
 
         # 尽量加载 .env（不强依赖）
         try:
@@ -348,14 +574,22 @@ class EvidenceStorageTool(BaseTool):
         except Exception:
             pass
 
-        # 1) 创建证据哈希（使用 SHA-256，确保跨平台一致性）
-        evidence_json = json.dumps(evidence_data, sort_keys=True, ensure_ascii=False)
-        evidence_hash = hashlib.sha256(evidence_json.encode("utf-8")).hexdigest()
+        # 1) 创建证据哈希（BLAKE3 或 SHA-256，算法标签随 payload 上链）
+        if evidence_digests is None:
+            try:
+                evidence_digests = [evidence_digest(evidence_data) for evidence_data in evidence_list]
+            except (TypeError, ValueError) as e:
+                return fail(
+                    {
+                        "status": "error",
+                        "error": "invalid_evidence",
+                        "message": f"证据数据无法规范化序列化：{e}",
+                    }
+                )
 
-        # 2) 组装上链 payload：前缀 + 32 字节 hash
-        prefix = b"SPOON_EVIDENCE_V1|"
-        payload = prefix + bytes.fromhex(evidence_hash)
-        data_hex = "0x" + payload.hex()
+        # 2) 组装上链 payload：前缀 + 算法标签 + 每条证据 32 字节 hash（直接使用原始 digest，无需 hex 往返）
+        prefix = _EVIDENCE_PREFIX if len(evidence_digests) == 1 else _EVIDENCE_BATCH_PREFIX
+        data_hex = "0x" + (prefix + _HASH_TAG + b"".join(evidence_digests)).hex()
 
         # 3) 获取 RPC（兼容项目里常见的变量名）
         rpc_url = (
@@ -364,14 +598,12 @@ class EvidenceStorageTool(BaseTool):
             or os.getenv("NEOX_RPC_URL")
         )
         if not rpc_url:
-            return json.dumps(
+            return fail(
                 {
                     "status": "error",
                     "error": "missing_rpc_url",
                     "message": "缺少 RPC 配置：请设置 WEB3_RPC_URL（或兼容使用 RPC_URL / NEOX_RPC_URL）",
-                },
-                ensure_ascii=True,
-                indent=2,
+                }
             )
 
         # 4) 获取签名私钥（支持明文 PRIVATE_KEY，或 ENC:v2 走 SecretVault 解密）
@@ -389,57 +621,54 @@ class EvidenceStorageTool(BaseTool):
             pass
 
         if not private_key:
-            return json.dumps(
+            return fail(
                 {
                     "status": "error",
                     "error": "missing_private_key",
                     "message": "缺少 PRIVATE_KEY：无法对交易签名并广播上链",
-                },
-                ensure_ascii=True,
-                indent=2,
+                }
             )
 
         # 5) 连接链并广播交易（legacy tx：最少坑，EIP-1559 链也能接受）
         try:
-            from web3 import Web3
-            from web3.middleware import ExtraDataToPOAMiddleware
             from eth_account import Account
             from eth_account.messages import encode_defunct
 
-            w3 = Web3(Web3.HTTPProvider(rpc_url))
-            try:
-                w3.middleware_onion.inject(ExtraDataToPOAMiddleware, layer=0)
-            except Exception:
-                # 不是 PoA 链也没关系
-                pass
+            # 使用 AsyncWeb3：RPC 往返与等待回执期间不阻塞事件循环
+            w3 = _get_async_web3(rpc_url)
 
-            if not w3.is_connected():
-                return json.dumps(
+            if not await w3.is_connected():
+                return fail(
                     {
                         "status": "error",
                         "error": "rpc_unreachable",
                         "message": f"无法连接 RPC：{rpc_url}",
                         "rpc_url": rpc_url,
-                    },
-                    ensure_ascii=True,
-                    indent=2,
+                    }
                 )
 
             account = Account.from_key(private_key)
             from_addr = account.address
 
-            nonce = w3.eth.get_transaction_count(from_addr)
-            chain_id = int(w3.eth.chain_id)
-            gas_price = w3.eth.gas_price
-
-            # 估算 gas（失败则给一个保守兜底）
-            try:
-                gas = w3.eth.estimate_gas(
-                    {"from": from_addr, "to": from_addr, "value": 0, "data": data_hex}
-                )
-                gas = int(gas * 2)  # 留余量，降低失败概率
-            except Exception:
-                gas = 80000
+            # 估算 gas（失败则按证据条数给一个保守兜底）
+            async def estimate_gas() -> int:
+                try:
+                    gas = await w3.eth.estimate_gas(
+                        {"from": from_addr, "to": from_addr, "value": 0, "data": data_hex}
+                    )
+                    return int(gas * 2)  # 留余量，降低失败概率
+                except Exception:
+                    return 80000 + 1024 * (len(evidence_digests) - 1)
+
+            # 交易参数的 RPC 查询并发发出，总耗时约为一次往返
+            # nonce 取 pending 计数：已广播未打包的交易也计入，上一笔回执未到时可直接发下一笔；
+            # 被丢弃的交易不会留下永久的 nonce 空洞
+            nonce, chain_id, gas_price, gas = await asyncio.gather(
+                w3.eth.get_transaction_count(from_addr, "pending"),
+                _get_chain_id(w3, rpc_url),
+                w3.eth.gas_price,
+                estimate_gas(),
+            )
 
             tx = {
                 "chainId": chain_id,
@@ -452,68 +681,66 @@ class EvidenceStorageTool(BaseTool):
             }
 
             signed_tx = account.sign_transaction(tx)
-            tx_hash_bytes = w3.eth.send_raw_transaction(signed_tx.raw_transaction)
+            tx_hash_bytes = await w3.eth.send_raw_transaction(signed_tx.raw_transaction)
             tx_hash = tx_hash_bytes.hex()
 
-            # 可选：等待回执（短超时；超时也不影响“已广播”事实）
-            receipt_status = None
-            try:
-                receipt = w3.eth.wait_for_transaction_receipt(tx_hash_bytes, timeout=30)
-                receipt_status = int(getattr(receipt, "status", receipt.get("status", 0)))  # type: ignore[attr-defined]
-            except Exception:
-                receipt_status = None
-
-            # 同一把私钥对“证据哈希声明”做一次签名，便于做主体证明（非必须）
-            msg = f"Evidence Hash: {evidence_hash}\nTimestamp: {datetime.now().isoformat()}"
-            sig = account.sign_message(encode_defunct(text=msg)).signature.hex()
-
             # Explorer 链接（优先用 SCAN_URL）
             scan_url = os.getenv("SCAN_URL")
             explorer = None
             if scan_url:
                 explorer = scan_url.rstrip("/") + "/tx/" + tx_hash
 
-            result = {
-                "status": "success",
-                "mode": "calldata_anchor_tx",
-                "chain_id": chain_id,
-                "rpc_url": rpc_url,
-                "from": from_addr,
-                "tx_hash": tx_hash,
-                "receipt_status": receipt_status,  # None 表示未等待到/超时
-                "evidence_hash": evidence_hash,
-                "data_hex": data_hex,
-                "signature": sig,
-                "timestamp": datetime.now().isoformat(),
-                "evidence_data": evidence_data,
-                "explorer": explorer,
-            }
+            timestamp = now_iso()
+            results = []
+            for index, (evidence_data, digest) in enumerate(zip(evidence_list, evidence_digests)):
+                evidence_hash = digest.hex()
+
+                # 同一把私钥对“证据哈希声明”做一次签名，便于做主体证明（非必须）
+                msg = f"Evidence Hash: {evidence_hash}\nTimestamp: {timestamp}"
+                sig = account.sign_message(encode_defunct(text=msg)).signature.hex()
+
+                result = {
+                    "status": "success",
+                    "mode": "calldata_anchor_tx",
+                    "chain_id": chain_id,
+                    "rpc_url": rpc_url,
+                    "from": from_addr,
+                    "tx_hash": tx_hash,
+                    "receipt_status": None,  # 由回执等待方写回；None 表示未等待到/超时
+                    "evidence_hash": evidence_hash,
+                    "hash_algorithm": EVIDENCE_HASH_NAME,
+                    "data_hex": data_hex,
+                    "signature": sig,
+                    "timestamp": timestamp,
+                    "evidence_data": evidence_data,
+                    "explorer": explorer,
+                }
+                if len(evidence_list) > 1:
+                    # 批量交易中该证据 hash 的位置：前缀之后第 batch_index 个 32 字节
+                    result["batch_index"] = index
+                    result["batch_size"] = len(evidence_list)
 
-            logger.info(f"证据已上链(真实交易): {tx_hash}")
-            # 为了在 Windows 默认控制台编码下更稳（避免 emoji / 非 GBK 字符导致打印异常）
-            # 这里使用 ensure_ascii=True，把非 ASCII 字符转义成 \\uXXXX。
-            return json.dumps(result, ensure_ascii=True, indent=2)
+                results.append(result)
+
+            logger.info("证据已上链(真实交易): %s，共 %d 条", tx_hash, len(evidence_list))
+            return results, _wait_receipt(w3, tx_hash_bytes)
 
         except ImportError as e:
-            return json.dumps(
+            return fail(
                 {
                     "status": "error",
                     "error": "missing_dependencies",
                     "message": f"缺少依赖，无法上链：{e}",
                     "hint": "请安装: pip install web3 eth-account",
-                },
-                ensure_ascii=True,
-                indent=2,
+                }
             )
         except Exception as e:
-            return json.dumps(
+            return fail(
                 {
                     "status": "error",
                     "error": "onchain_failed",
                     "message": f"上链失败: {str(e)}",
-                },
-                ensure_ascii=True,
-                indent=2,
+                }
             )
 
 class RealMessageMonitorAgent(ToolCallAgent):
@@ -612,13 +839,13 @@ async def main():
         "message": {
             "sender": "老板",
             "content": "小王，这个月加班费已经发放到工资里了",
-            "timestamp": datetime.now().isoformat(),
+            "timestamp": now_iso(),
             "group": "工作群"
         },
         "detection_info": {
             "keywords": keywords,
             "matched_keywords": ["加班费", "工资"],
-            "detection_time": datetime.now().isoformat()
+            "detection_time": now_iso()
         }
     }
 
@@ -637,6 +864,8 @@ async def main():
     print("4. 区块链: 配置Turnkey API密钥和钱包")
     print("5. 安全: 确保所有操作符合法律法规")
 
+    await close_http_session()
+
 if __name__ == "__main__":
     # 配置日志
     logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
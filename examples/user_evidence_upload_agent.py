@@ -9,10 +9,9 @@
 """
 
 import asyncio
-import json
+import codecs
 import os
-from datetime import datetime
-from typing import Dict, Any, Optional
+from typing import Any, Awaitable, Dict, List, Optional, Tuple
 import logging
 
 from spoon_ai.agents.toolcall import ToolCallAgent
@@ -21,8 +20,219 @@ from spoon_ai.tools import ToolManager
 from spoon_ai.chat import ChatBot
 from pydantic import Field
 
+from examples.auto_evidence_agent import (
+    EVIDENCE_HASH_NAME,
+    encode_json,
+    evidence_digest,
+    new_evidence_hasher,
+    now_iso,
+)
+
+try:
+    import msgspec
+except ImportError:  # msgspec 为可选加速依赖，缺失时响应按字典经 encode_json 序列化
+    msgspec = None
+
+try:
+    import aiofiles
+    import aiofiles.os
+except ImportError:  # aiofiles 为可选依赖，缺失时在线程池中分块读取
+    aiofiles = None
+
 logger = logging.getLogger(__name__)
 
+if msgspec is not None:
+    # 固定形状的响应：Struct + 专用编码器，字段名与编码路径在导入时确定
+    class _EvidencePreview(msgspec.Struct):
+        type: str
+        source: str
+        content_preview: str
+        timestamp: str
+        uploader_address: str
+        file_name: str
+
+    class _SuccessResponse(msgspec.Struct):
+        status: str
+        message: str
+        evidence: _EvidencePreview
+        onchain: Dict[str, Any]
+
+    class _ErrorResponse(msgspec.Struct, omit_defaults=True):
+        status: str
+        error: str
+        message: str
+        onchain: Optional[Dict[str, Any]] = None
+
+    _RESPONSE_ENCODER = msgspec.json.Encoder()
+
+def _error_response(error: str, message: str, onchain: Optional[Dict[str, Any]] = None) -> str:
+    """失败响应：{status, error, message[, onchain]}"""
+    if msgspec is not None:
+        return _RESPONSE_ENCODER.encode(_ErrorResponse("error", error, message, onchain)).decode("utf-8")
+    payload = {"status": "error", "error": error, "message": message}
+    if onchain is not None:
+        payload["onchain"] = onchain
+    return encode_json(payload)
+
+def _success_response(evidence: Dict[str, str], onchain: Dict[str, Any]) -> str:
+    """成功响应：{status, message, evidence, onchain}"""
+    message = "证据上传并上链成功"
+    if msgspec is not None:
+        response = _SuccessResponse("success", message, _EvidencePreview(**evidence), onchain)
+        return _RESPONSE_ENCODER.encode(response).decode("utf-8")
+    return encode_json({"status": "success", "message": message, "evidence": evidence, "onchain": onchain})
+
+# 支持的证据类型（schema 枚举与入参校验共用）
+VALID_EVIDENCE_TYPES: frozenset = frozenset({"message", "document", "image", "audio", "video", "binary", "other"})
+
+# 文件分块读取大小（64 KiB）与文本预览长度
+_FILE_CHUNK_SIZE = 64 * 1024
+_TEXT_PREVIEW_CHARS = 200
+# 按文本解码的证据类型，其余类型只做字节级哈希
+_TEXT_EVIDENCE_TYPES = ("message", "document")
+
+async def _stat(file_path: str) -> Optional[os.stat_result]:
+    """非阻塞 stat：文件不存在或不可访问时返回 None"""
+    try:
+        if aiofiles is not None:
+            return await aiofiles.os.stat(file_path)
+        return await asyncio.to_thread(os.stat, file_path)
+    except OSError:
+        return None
+
+async def _hash_file(file_path: str, hasher, decode_text: bool) -> Tuple[int, str]:
+    """
+    以 64 KiB 分块流式读取文件并更新 hasher，不把整个文件读入内存、也不阻塞事件循环。
+    返回 (文件字节数, 文本预览)；仅 decode_text 为真时增量解码 UTF-8 生成预览。
+    """
+    size = 0
+    preview = []
+    preview_len = 0
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace") if decode_text else None
+
+    def consume(chunk: bytes) -> None:
+        nonlocal size, preview_len, decoder
+        size += len(chunk)
+        hasher.update(chunk)
+        if decoder is not None:
+            text = decoder.decode(chunk)
+            preview.append(text)
+            preview_len += len(text)
+            if preview_len >= _TEXT_PREVIEW_CHARS:
+                decoder = None
+
+    if aiofiles is not None:
+        async with aiofiles.open(file_path, "rb") as f:
+            while chunk := await f.read(_FILE_CHUNK_SIZE):
+                consume(chunk)
+    else:
+        f = await asyncio.to_thread(open, file_path, "rb")
+        try:
+            while chunk := await asyncio.to_thread(f.read, _FILE_CHUNK_SIZE):
+                consume(chunk)
+        finally:
+            f.close()
+
+    return size, "".join(preview)[:_TEXT_PREVIEW_CHARS]
+
+# 批量上链窗口：窗口期内到达的上传合并为一笔交易
+_BATCH_WINDOW_MS = int(os.getenv("EVIDENCE_BATCH_WINDOW_MS", "200"))
+_MAX_BATCH = int(os.getenv("EVIDENCE_MAX_BATCH", "32"))
+
+class BatchingEvidenceUploader:
+    """
+    证据批量上链器：收集窗口期内（或达到 max_batch 条）的 (evidence_data, sign_with)，
+    按 sign_with 分组后通过 send_batch 合并为一笔交易上链，再把结果分发回各调用方。
+
+    交易广播后回执的等待交给独立任务，收集器立即处理下一批；队列中只有一条上传时不等待窗口期。
+    """
+
+    def __init__(self, storage_tool, window_ms: int = _BATCH_WINDOW_MS, max_batch: int = _MAX_BATCH):
+        self._storage_tool = storage_tool
+        self._window = window_ms / 1000
+        self._max_batch = max(1, max_batch)
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        # 等待回执的任务（保留引用，避免被垃圾回收）
+        self._receipt_tasks: set = set()
+
+    def _ensure_worker(self) -> asyncio.Queue:
+        # 队列与后台任务绑定在当前事件循环上；循环变化或任务退出时重建
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop or self._worker is None or self._worker.done():
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._worker = loop.create_task(self._run())
+        return self._queue
+
+    async def submit(self, evidence_data: Dict[str, Any], sign_with: str) -> Dict[str, Any]:
+        """提交一条证据，返回该证据对应的上链结果字典"""
+        # 入队前逐条计算摘要：无法序列化的证据只让本次调用失败，不拖累同批的其他证据
+        digest = evidence_digest(evidence_data)
+        future = asyncio.get_running_loop().create_future()
+        self._ensure_worker().put_nowait((evidence_data, digest, sign_with, future))
+        return await future
+
+    async def _run(self) -> None:
+        queue = self._queue
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await queue.get()]
+            # 队列中还有其他上传时才等待窗口期凑批；只有这一条时直接发送
+            if not queue.empty():
+                deadline = loop.time() + self._window
+                while len(batch) < self._max_batch:
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        batch.append(await asyncio.wait_for(queue.get(), timeout))
+                    except asyncio.TimeoutError:
+                        break
+
+            groups: Dict[str, List[Tuple[Dict[str, Any], bytes, asyncio.Future]]] = {}
+            for evidence_data, digest, sign_with, future in batch:
+                groups.setdefault(sign_with, []).append((evidence_data, digest, future))
+
+            for sign_with, items in groups.items():
+                try:
+                    results, receipt = await self._storage_tool.send_batch(
+                        [evidence_data for evidence_data, _, _ in items],
+                        sign_with,
+                        [digest for _, digest, _ in items],
+                    )
+                except Exception as e:
+                    for _, _, future in items:
+                        if not future.done():
+                            future.set_exception(e)
+                    continue
+                if receipt is None:
+                    self._resolve(items, results)
+                    continue
+                task = loop.create_task(self._resolve_after_receipt(items, results, receipt))
+                self._receipt_tasks.add(task)
+                task.add_done_callback(self._receipt_tasks.discard)
+
+    @staticmethod
+    def _resolve(items: List[Tuple[Dict[str, Any], bytes, asyncio.Future]], results: List[Dict[str, Any]]) -> None:
+        for (_, _, future), result in zip(items, results):
+            if not future.done():
+                future.set_result(result)
+
+    @classmethod
+    async def _resolve_after_receipt(
+        cls,
+        items: List[Tuple[Dict[str, Any], bytes, asyncio.Future]],
+        results: List[Dict[str, Any]],
+        receipt: Awaitable[Optional[int]],
+    ) -> None:
+        """等待回执并写回 receipt_status 后再唤醒调用方"""
+        receipt_status = await receipt
+        for result in results:
+            result["receipt_status"] = receipt_status
+        cls._resolve(items, results)
+
 class UserEvidenceUploadTool(BaseTool):
     """用户证据上传工具"""
 
@@ -38,7 +248,7 @@ class UserEvidenceUploadTool(BaseTool):
             "evidence_type": {
                 "type": "string",
                 "description": "证据类型，如'message', 'document', 'image', 'audio'等",
-                "enum": ["message", "document", "image", "audio", "video", "binary", "other"]
+                "enum": sorted(VALID_EVIDENCE_TYPES)
             },
             "source": {
                 "type": "string",
@@ -76,6 +286,7 @@ class UserEvidenceUploadTool(BaseTool):
         super().__init__(**kwargs)
         # 延迟初始化证据存储工具
         self._evidence_storage_tool = None
+        self._uploader = None
 
     @property
     def evidence_storage_tool(self):
@@ -84,6 +295,12 @@ class UserEvidenceUploadTool(BaseTool):
             self._evidence_storage_tool = EvidenceStorageTool()
         return self._evidence_storage_tool
 
+    @property
+    def uploader(self) -> BatchingEvidenceUploader:
+        if self._uploader is None:
+            self._uploader = BatchingEvidenceUploader(self.evidence_storage_tool)
+        return self._uploader
+
     async def execute(
         self,
         evidence_content: str,
@@ -100,33 +317,14 @@ class UserEvidenceUploadTool(BaseTool):
 
         try:
             # 验证输入
-            if not evidence_content or not evidence_content.strip():
-                return json.dumps(
-                    {"status": "error", "error": "empty_content", "message": "证据内容不能为空"},
-                    ensure_ascii=True,
-                    indent=2,
-                )
-
-            if evidence_type not in ["message", "document", "image", "audio", "video", "binary", "other"]:
-                return json.dumps(
-                    {
-                        "status": "error",
-                        "error": "unsupported_type",
-                        "message": f"不支持的证据类型: {evidence_type}",
-                    },
-                    ensure_ascii=True,
-                    indent=2,
-                )
-
-            # 如果提供了文件路径，尝试读取文件内容
-            if file_path and os.path.exists(file_path):
-                try:
-                    with open(file_path, 'r', encoding='utf-8') as f:
-                        file_content = f.read()
-                    evidence_content = f"{evidence_content}\n\n文件内容:\n{file_content}"
-                except Exception as e:
-                    logger.warning(f"读取文件失败: {e}")
-                    # 继续使用原始内容
+            # 只做一次 strip，后续载荷与预览都复用 content
+            content = evidence_content.strip() if evidence_content else ""
+            if not content:
+                return _error_response("empty_content", "证据内容不能为空")
+
+            # HTTP 入口已提前校验；此处仍需兜底 LLM 工具调用传入的值（框架不校验 enum）
+            if evidence_type not in VALID_EVIDENCE_TYPES:
+                return _error_response("unsupported_type", f"不支持的证据类型: {evidence_type}")
 
             # 构建证据数据结构
             merged_metadata: Dict[str, Any] = {}
@@ -140,71 +338,61 @@ class UserEvidenceUploadTool(BaseTool):
                 merged_metadata["file_name"] = file_name
 
             evidence_data = {
-                "content": evidence_content.strip(),
+                "content": content,
                 "type": evidence_type,
                 "source": source,
-                "timestamp": datetime.now().isoformat(),
+                "timestamp": now_iso(),
                 "uploader": uploader_address or "user",  # 标识为用户上传
                 "metadata": merged_metadata
             }
 
-            # 添加文件信息（如果有）
+            # 添加文件信息（如果有）：文件内容以流式哈希的形式进入证据，不再拼接到 evidence_content
             if file_path:
-                evidence_data["file_info"] = {
+                # 只做一次 stat，存在性与大小都从同一结果得到
+                st = await _stat(file_path)
+                file_info = {
                     "path": file_path,
-                    "exists": os.path.exists(file_path),
-                    "size": os.path.getsize(file_path) if os.path.exists(file_path) else 0
+                    "exists": st is not None,
+                    "size": st.st_size if st is not None else 0
                 }
+                if st is not None:
+                    try:
+                        hasher = new_evidence_hasher()
+                        size, preview = await _hash_file(
+                            file_path, hasher, evidence_type in _TEXT_EVIDENCE_TYPES
+                        )
+                        file_info["size"] = size
+                        file_info["hash"] = hasher.hexdigest()
+                        file_info["hash_algorithm"] = EVIDENCE_HASH_NAME
+                        if preview:
+                            file_info["text_preview"] = preview
+                    except Exception as e:
+                        logger.warning("读取文件失败: %s", e)
+                        # 继续使用原始内容
+                evidence_data["file_info"] = file_info
 
-            # 使用证据存储工具上链
-            result = await self.evidence_storage_tool.execute(
-                evidence_data=evidence_data,
-                sign_with=sign_with
-            )
+            # 交给批量上链器：窗口期内的多次上传合并为一笔交易
+            # 存储工具直接返回结果字典（成功/失败），最终只在返回时序列化一次
+            onchain = await self.uploader.submit(evidence_data, sign_with)
 
-            # 证据工具会返回 JSON 字符串（成功/失败），这里统一解析并封装返回
-            try:
-                onchain = json.loads(result) if isinstance(result, str) else {"raw": str(result)}
-            except Exception:
-                onchain = {"raw": result}
-
-            if isinstance(onchain, dict) and onchain.get("status") == "error":
-                return json.dumps(
-                    {
-                        "status": "error",
-                        "error": "onchain_failed",
-                        "message": "证据上链失败",
-                        "onchain": onchain,
-                    },
-                    ensure_ascii=True,
-                    indent=2,
-                )
-
-            return json.dumps(
+            if onchain.get("status") == "error":
+                return _error_response("onchain_failed", "证据上链失败", onchain)
+
+            return _success_response(
                 {
-                    "status": "success",
-                    "message": "证据上传并上链成功",
-                    "evidence": {
-                        "type": evidence_type,
-                        "source": source,
-                        "content_preview": evidence_content[:200],
-                        "timestamp": evidence_data["timestamp"],
-                        "uploader_address": uploader_address,
-                        "file_name": file_name,
-                    },
-                    "onchain": onchain,
+                    "type": evidence_type,
+                    "source": source,
+                    "content_preview": content[:_TEXT_PREVIEW_CHARS],
+                    "timestamp": evidence_data["timestamp"],
+                    "uploader_address": uploader_address,
+                    "file_name": file_name,
                 },
-                ensure_ascii=True,
-                indent=2,
+                onchain,
             )
 
         except Exception as e:
-            logger.error(f"证据上传处理失败: {e}")
-            return json.dumps(
-                {"status": "error", "error": "exception", "message": f"处理失败: {str(e)}"},
-                ensure_ascii=True,
-                indent=2,
-            )
+            logger.error("证据上传处理失败: %s", e, exc_info=True)
+            return _error_response("exception", f"处理失败: {str(e)}")
 
 class UserEvidenceUploadAgent(ToolCallAgent):
     """用户证据上传上链代理"""
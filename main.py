@@ -4,15 +4,40 @@ SpoonOS 法律公正助手 - 主程序
 """
 import asyncio
 import os
-from flask import Flask, request, jsonify
-from flask_cors import CORS
+from contextlib import asynccontextmanager
+import threading
+import httpx
+from cachetools import LRUCache
+from fastapi import FastAPI, Request
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 
 from dotenv import load_dotenv
 
 # 1. 最先加载 .env，确保后续代码能读取环境变量
 load_dotenv()
-app = Flask(__name__)
-CORS(app) # 解决跨域问题
+
+
+def _report_warm_up(future: asyncio.Future) -> None:
+    """预热失败时打印原因；首个 /api/chat 会再次尝试初始化"""
+    if not future.cancelled() and future.exception() is not None:
+        print(f"❌ Agent 预热失败: {future.exception()}")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """应用生命周期（init_chat_agent 与 http_client 定义在下方，启动时均已就绪）"""
+    # 启动：后台线程预热 Agent，服务立即开始接受连接；首个 /api/chat 若早于预热完成则等待其结束
+    app.state.warm_up = asyncio.get_running_loop().run_in_executor(None, init_chat_agent)
+    app.state.warm_up.add_done_callback(_report_warm_up)
+    yield
+    # 关闭：释放共享的 LLM HTTP 连接池
+    await http_client.aclose()
+
+
+# ASGI 应用：协程视图直接运行在事件循环上，并发请求的 LLM 调用可以相互重叠
+app = FastAPI(lifespan=lifespan)
+app.add_middleware(CORSMiddleware, allow_origins=["*"], allow_methods=["*"], allow_headers=["*"]) # 解决跨域问题
 
 # 2. 显式获取配置（必须在创建 LLM 之前）
 api_key = os.getenv("OPENAI_API_KEY")
@@ -27,28 +52,39 @@ if not api_key:
 # 3. 显式初始化 DeepSeek LLM，使用 OpenAILike 避免模型名校验
 from llama_index.llms.openai_like import OpenAILike
 
+
+def _build_http_client() -> httpx.AsyncClient:
+    """进程级共享的 LLM HTTP 客户端：长连接复用，安装 h2 时启用 HTTP/2 多路复用"""
+    limits = httpx.Limits(max_connections=100, max_keepalive_connections=100, keepalive_expiry=60)
+    timeout = httpx.Timeout(60, connect=5)
+    try:
+        return httpx.AsyncClient(http2=True, limits=limits, timeout=timeout)
+    except ImportError:  # 未安装 h2 时退回 HTTP/1.1 keep-alive
+        return httpx.AsyncClient(limits=limits, timeout=timeout)
+
+
+http_client = _build_http_client()
+
 llm = OpenAILike(
     api_key=api_key,
     api_base=api_base,
     model=model_name,
     is_chat_model=True,
+    async_http_client=http_client,
 )
 
-# 4. 配置全局 Settings
+# 4. 配置全局 Settings（嵌入模型在 init_chat_agent 中延迟加载）
 from llama_index.core import Settings
-from llama_index.embeddings.huggingface import HuggingFaceEmbedding
 
 Settings.llm = llm
-Settings.embed_model = HuggingFaceEmbedding(model_name="BAAI/bge-small-zh-v1.5")
 
-# 5. 引入技能（需在 Settings 配置之后）
+# 5. 引入 Agent 相关组件；技能与嵌入模型较重，延迟到 init_chat_agent 中加载
 from llama_index.core.agent.workflow import ReActAgent
 from llama_index.core.agent.workflow import AgentStream
 from llama_index.core.memory import ChatMemoryBuffer
 from llama_index.core.workflow import Context
 
-from skills.legal_skill import search_laws
-from skills.notary_skill import notarize_on_chain
+from prompt_cache import PromptCache, chat_with_cache
 
 # 6. 系统提示词：SpoonOS 法律公正助手
 SYSTEM_PROMPT = """你是 SpoonOS 法律公正助手。
@@ -59,43 +95,106 @@ SYSTEM_PROMPT = """你是 SpoonOS 法律公正助手。
 3. 如果用户明确要求对某段内容进行存证，则调用 notarize_on_chain 工具完成区块链存证。
 """
 
-# 7. 构建 ReActAgent，显式传入 llm
-agent = ReActAgent(
-    tools=[search_laws, notarize_on_chain],
-    llm=llm,
-    system_prompt=SYSTEM_PROMPT,
-    verbose=True,
-)
+# 7. ReActAgent 与提示缓存：首次使用时构建（启动后在后台线程预热）
+agent = None
+prompt_cache = None
+_agent_lock = threading.Lock()
+
+
+def init_chat_agent():
+    """加载嵌入模型、技能并构建 ReActAgent（只执行一次）"""
+    global agent, prompt_cache
+    with _agent_lock:
+        if agent is not None:
+            return agent
+
+        from embedding import get_embed_model
+
+        # 技能依赖嵌入模型，需在 Settings 配置之后引入
+        Settings.embed_model = get_embed_model()
+        from skills.legal_skill import search_laws
+        from skills.notary_skill import notarize_on_chain
+
+        new_agent = ReActAgent(
+            tools=[search_laws, notarize_on_chain],
+            llm=llm,
+            system_prompt=SYSTEM_PROMPT,
+            verbose=True,
+        )
 
-# 8. 创建上下文与记忆
-ctx = Context(agent)
-memory = ChatMemoryBuffer.from_defaults(llm=llm)
+        # 提示缓存（精确 + 语义），PROMPT_CACHE=0 可关闭
+        if os.getenv("PROMPT_CACHE", "1") != "0":
+            prompt_cache = PromptCache(Settings.embed_model)
+
+        agent = new_agent
+        return agent
+
+# 8. 按会话隔离的 (Context, 对话记忆, 会话锁)：LRU 淘汰最久未活跃的会话，token_limit 限制单个会话的上下文长度
+_MEMORY_TOKEN_LIMIT = int(os.getenv("CHAT_MEMORY_TOKEN_LIMIT", "3000"))
+SESSIONS = LRUCache(maxsize=int(os.getenv("CHAT_MAX_SESSIONS", "10000")))
+
+
+def get_session(session_id: str):
+    """按会话 ID 获取（必要时创建）该会话的上下文、记忆与锁"""
+    session = SESSIONS.get(session_id)
+    if session is None:
+        session = (
+            Context(agent),
+            ChatMemoryBuffer.from_defaults(llm=llm, token_limit=_MEMORY_TOKEN_LIMIT),
+            asyncio.Lock(),
+        )
+        SESSIONS[session_id] = session
+    return session
 
 
 # --- 3. API 路由 ---
 # --- 修改后的 API 路由 ---
-@app.route('/api/chat', methods=['POST'])
-async def chat():
-    user_input = request.json.get('message')
+@app.post('/api/chat')
+async def chat(request: Request):
+    try:
+        body = await request.json()
+    except ValueError:
+        return JSONResponse({"error": "Invalid JSON"}, status_code=400)
+    user_input = body.get('message') if isinstance(body, dict) else None
     if not user_input:
-        return jsonify({"error": "No message"}), 400
+        return JSONResponse({"error": "No message"}, status_code=400)
+    # 会话 ID：优先取请求头，其次取请求体；都没有时归入默认会话
+    session_id = request.headers.get("X-Session-Id") or body.get("session_id") or "default"
 
     try:
-        # 使用 agent.run 获取执行句柄
-        handler = agent.run(user_input, memory=memory, ctx=ctx)
-        
-        # 这种方式会自动处理 ReAct 的思考过程，最终结果会直接包含在响应对象中
-        response = await handler 
-        
-        # response 对象通常包含最终的 content，过滤掉中间的推理步骤
-        return jsonify({"response": str(response)})
+        if agent is None:
+            await asyncio.to_thread(init_chat_agent)
+        ctx, memory, lock = get_session(session_id)
+
+        # agent.run 返回的执行句柄会自动处理 ReAct 的思考过程，最终结果直接包含在响应对象中
+        answer, cached = await chat_with_cache(
+            prompt_cache, memory, lock, user_input,
+            lambda: agent.run(user_input, memory=memory, ctx=ctx),
+        )
+        if cached:
+            return {"response": answer, "cached": True}
+        return {"response": answer}
     except Exception as e:
-        return jsonify({"error": str(e)}), 500
+        return JSONResponse({"error": str(e)}, status_code=500)
 # 原有的上传逻辑可保留在这里...
-@app.route('/api/upload-evidence', methods=['POST'])
-def upload_evidence():
+@app.post('/api/upload-evidence')
+async def upload_evidence():
     # ... 你之前的 Flask 存证逻辑 ...
-    return jsonify({"success": True, "tx_hash": "0x...", "evidence_hash": "..."})
+    return {"success": True, "tx_hash": "0x...", "evidence_hash": "..."}
 
+# 生产部署也可使用 gunicorn 管理 worker：
+# gunicorn -k uvicorn.workers.UvicornWorker -w $(nproc) -b 0.0.0.0:5000 main:app
 if __name__ == "__main__":
-    app.run(port=5000, debug=True)
\ No newline at end of file
+    # uvicorn 会在已安装时自动选用 uvloop / httptools（uvicorn[standard]）
+    import uvicorn
+
+    if os.getenv("DEV"):
+        # 本地调试：单进程 + 代码改动自动重载
+        uvicorn.run("main:app", host="127.0.0.1", port=5000, reload=True)
+    else:
+        uvicorn.run(
+            "main:app",
+            host="0.0.0.0",
+            port=5000,
+            workers=int(os.getenv("WEB_CONCURRENCY", "4")),
+        )
\ No newline at end of file
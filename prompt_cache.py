@@ -0,0 +1,172 @@
+"""
+对话提示缓存：/api/chat 调用 LLM 之前先查缓存，命中则直接返回历史回答。
+
+两级查找：
+1. 精确匹配：问题文本的 SHA256
+2. 语义匹配：bge 嵌入（L2 归一化）做内积，余弦相似度超过阈值视为命中
+
+未命中时，同一问题的并发请求会被合并：只有首个请求调用 LLM，其余请求等待其回答。
+chat_with_cache() 封装了上述流程，app.py（Flask）与 main.py（FastAPI）共用。
+"""
+import asyncio
+import concurrent.futures
+import contextlib
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+import numpy as np
+
+# 会产生链上副作用的工具：调用过这些工具的回答不能被缓存复用
+UNCACHEABLE_TOOLS = frozenset({"notarize_on_chain"})
+
+
+def is_cacheable(response) -> bool:
+    """Agent 回答过程中未调用有副作用的工具时才允许缓存"""
+    tool_calls = getattr(response, "tool_calls", None) or []
+    return not any(getattr(tc, "tool_name", None) in UNCACHEABLE_TOOLS for tc in tool_calls)
+
+
+class PromptCache:
+    """进程内的精确 + 语义两级提示缓存（FIFO 淘汰）"""
+
+    def __init__(self, embed_model, threshold: float = 0.92, max_entries: int = 1024):
+        self._embed_model = embed_model
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        # key -> 回答；与 _keys / _vectors 按插入顺序一一对应
+        self._responses: "OrderedDict[str, str]" = OrderedDict()
+        self._keys: list = []
+        self._vectors: Optional[np.ndarray] = None
+        # key -> 正在调用 LLM 的首个请求的 Future（线程安全，可在任意事件循环中 wrap_future 等待）
+        self._inflight: Dict[str, concurrent.futures.Future] = {}
+
+    @staticmethod
+    def _key(text: str) -> str:
+        return hashlib.sha256(text.strip().encode("utf-8")).hexdigest()
+
+    def _embed(self, text: str) -> np.ndarray:
+        vec = np.asarray(self._embed_model.get_query_embedding(text), dtype=np.float32)
+        norm = np.linalg.norm(vec)
+        return vec / norm if norm else vec
+
+    def lookup(self, text: str) -> Tuple[Optional[str], Optional[np.ndarray]]:
+        """查询缓存，返回 (缓存回答或 None, 问题嵌入)；嵌入可回传给 store() 复用"""
+        key = self._key(text)
+        with self._lock:
+            hit = self._responses.get(key)
+            if hit is not None or self._vectors is None:
+                return hit, None
+
+        vec = self._embed(text)
+        with self._lock:
+            if self._vectors is None:
+                return None, vec
+            scores = self._vectors @ vec
+            idx = int(scores.argmax())
+            if scores[idx] >= self.threshold:
+                return self._responses[self._keys[idx]], vec
+        return None, vec
+
+    def join(self, text: str) -> Optional[concurrent.futures.Future]:
+        """同一问题已有请求在调用 LLM 时返回其 Future；否则登记为首个请求并返回 None"""
+        key = self._key(text)
+        with self._lock:
+            pending = self._inflight.get(key)
+            if pending is None:
+                self._inflight[key] = concurrent.futures.Future()
+            return pending
+
+    def done(self, text: str, response: Optional[str]) -> None:
+        """首个请求结束后唤醒等待者；response 为 None 表示回答不可共享，等待者需自行调用 LLM"""
+        with self._lock:
+            pending = self._inflight.pop(self._key(text), None)
+        if pending is not None:
+            pending.set_result(response)
+
+    def store(self, text: str, response: str, vector: Optional[np.ndarray] = None) -> None:
+        """写入缓存；超过容量时淘汰最早的条目"""
+        key = self._key(text)
+        if vector is None:
+            vector = self._embed(text)
+
+        with self._lock:
+            if key in self._responses:
+                self._responses[key] = response
+                return
+
+            self._responses[key] = response
+            self._keys.append(key)
+            row = vector[None, :]
+            self._vectors = row if self._vectors is None else np.vstack([self._vectors, row])
+
+            if len(self._keys) > self.max_entries:
+                oldest = self._keys.pop(0)
+                del self._responses[oldest]
+                self._vectors = self._vectors[1:]
+
+
+@contextlib.asynccontextmanager
+async def _hold(lock):
+    """同时支持 asyncio.Lock（main.py）与 threading.Lock（app.py）的会话锁"""
+    if hasattr(lock, "__aenter__"):
+        async with lock:
+            yield
+    else:
+        with lock:
+            yield
+
+
+async def chat_with_cache(
+    cache: Optional[PromptCache],
+    memory,
+    lock,
+    user_input: str,
+    run_agent: Callable[[], Awaitable[Any]],
+    offload: bool = True,
+) -> Tuple[str, bool]:
+    """
+    带提示缓存的一轮对话，返回 (回答, 是否命中缓存)。
+
+    run_agent 在会话锁内调用，返回 Agent 的响应对象；offload 为 True 时缓存查找 / 写入
+    （一次同步的 bge 前向计算）放到线程中执行，以免阻塞共享的事件循环。
+    """
+    from llama_index.core.llms import ChatMessage
+
+    async def call(fn, *args):
+        return await asyncio.to_thread(fn, *args) if offload else fn(*args)
+
+    # 提示缓存只按问题文本索引，仅用于会话首轮：后续轮次的回答依赖本会话上下文，不能跨会话复用
+    use_cache = cache is not None and not memory.get_all()
+    # 先查提示缓存，命中则跳过 LLM；同时补写记忆，保持多轮对话上下文连贯
+    cached, query_vec = await call(cache.lookup, user_input) if use_cache else (None, None)
+    # 未命中时合并同一问题的并发首轮请求：已有请求在调用 LLM 则等待其回答
+    leader = False
+    if cached is None and use_cache:
+        pending = cache.join(user_input)
+        leader = pending is None
+        if pending is not None:
+            cached = await asyncio.wrap_future(pending)
+    if cached is not None:
+        async with _hold(lock):
+            memory.put(ChatMessage(role="user", content=user_input))
+            memory.put(ChatMessage(role="assistant", content=cached))
+        return cached, True
+
+    shared = None
+    try:
+        # 同一会话的请求串行执行，不同会话互不阻塞
+        async with _hold(lock):
+            # 拿到锁时再确认一次：期间本会话可能已有其他轮次写入记忆
+            fresh = not memory.get_all()
+            response = await run_agent()
+        answer = str(response)
+        if use_cache and fresh and is_cacheable(response):
+            await call(cache.store, user_input, answer, query_vec)
+            shared = answer
+    finally:
+        if leader:
+            cache.done(user_input, shared)
+    return answer, False
@@ -8,10 +8,11 @@ from llama_index.core import (
     load_index_from_storage,
 )
 from llama_index.core.tools import QueryEngineTool
-from llama_index.embeddings.huggingface import HuggingFaceEmbedding
+
+from embedding import get_embed_model
 
 # 使用与 build_knowledge.py 相同的嵌入模型，加载索引时必须一致
-_EMBED_MODEL = HuggingFaceEmbedding(model_name="BAAI/bge-small-zh-v1.5")
+_EMBED_MODEL = get_embed_model()
 
 # 加载 ./storage 下的向量索引
 _STORAGE_DIR = Path(__file__).resolve().parent.parent / "storage"
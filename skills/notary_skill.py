@@ -12,6 +12,9 @@ from llama_index.core.tools import FunctionTool
 # 加载环境变量
 load_dotenv()
 
+# 上链 payload 前缀
+_NOTARY_PREFIX = b"NOTARY_V1|"
+
 
 def notarize_document(text: str) -> str:
     """
@@ -23,12 +26,10 @@ def notarize_document(text: str) -> str:
     load_dotenv(verbose=True, override=True)
     
     # 1. 计算文本的 SHA256 哈希
-    doc_hash = hashlib.sha256(text.encode("utf-8")).hexdigest()
+    doc_digest = hashlib.sha256(text.encode("utf-8")).digest()
     
-    # 2. 组装上链 payload：前缀 + 32 字节 hash
-    prefix = b"NOTARY_V1|"
-    payload = prefix + bytes.fromhex(doc_hash)
-    data_hex = "0x" + payload.hex()
+    # 2. 组装上链 payload：前缀 + 32 字节 hash（直接使用原始 digest，一次编码为 hex）
+    data_hex = "0x" + (_NOTARY_PREFIX + doc_digest).hex()
     
     # 3. 获取配置
     rpc_url = os.getenv("WEB3_RPC_URL")